@@ -3,10 +3,21 @@ import pandas as pd
 import numpy as np
 from datetime import timedelta
 
+import config
+from correlation import RollingCorrelation
+from indicator_cache import format_stats, get_cache
+
 WINDOWS = {"1mo": 20, "3mo": 60, "6mo": 120}
 WEIGHTS = {"1mo": 3.0, "3mo": 2.0, "6mo": 1.0}
+SMA_WINDOW = 25
+RSI_WINDOW = 14
 
 def add_indicators_strict(df: pd.DataFrame) -> pd.DataFrame:
+    # 同じ価格データ・同じパラメータなら計算済みの結果を使う（WEIGHTS は判定側でのみ使うのでキーに含めない）
+    params = {"windows": WINDOWS, "sma": SMA_WINDOW, "rsi": RSI_WINDOW}
+    return get_cache().get_or_compute("add_indicators_strict", df, params, _compute_indicators_strict)
+
+def _compute_indicators_strict(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     if isinstance(df.columns, pd.MultiIndex):
         df.columns = df.columns.get_level_values(0)
@@ -30,9 +41,9 @@ def add_indicators_strict(df: pd.DataFrame) -> pd.DataFrame:
         df[f"lower_1_{name}"] = center - sigma1
         df[f"lower_2_{name}"] = center - 2 * sigma1
 
-    df["SMA25"] = adj.rolling(25).mean()
+    df["SMA25"] = adj.rolling(SMA_WINDOW).mean()
 
-    window = 14
+    window = RSI_WINDOW
     delta = adj.diff()
     gain = delta.where(delta > 0, 0.0).ewm(alpha=1/window, min_periods=window).mean()
     loss = (-delta.where(delta < 0, 0.0)).ewm(alpha=1/window, min_periods=window).mean()
@@ -121,29 +132,75 @@ def action_from_judge(judge: str, treat_gamble_as_buy: bool = False) -> str:
         return "SELL"
     return "HOLD"
 
-def run_strict_backtest_with_combined_judge(
-    tickers,
-    start_date,
-    end_date,
-    initial_capital=1_000_000,
-    unit=100,
-    fee_rate=0.0,
-    slippage_rate=0.0,
-    treat_gamble_as_buy=False,
-):
+def load_backtest_data(tickers, start_date, end_date, confirm_timeframes=()):
+    # 銘柄ごとのデータ取得と指標計算（銘柄間で独立なのでシャードに分けて実行できる）
     data_map = {}
-    fetch_start = (pd.to_datetime(start_date) - timedelta(days=250)).strftime("%Y-%m-%d")
+    lookback = 250
+    if confirm_timeframes:
+        import timeframe
+        lookback = max([lookback] + [timeframe.lookback_days(tf) for tf in confirm_timeframes])
+    fetch_start = (pd.to_datetime(start_date) - timedelta(days=lookback)).strftime("%Y-%m-%d")
 
     for ticker in tickers:
         try:
             df = yf.download(ticker, start=fetch_start, end=end_date, progress=False, auto_adjust=False)
             if df.empty:
                 continue
+            raw = df
             df = add_indicators_strict(df)
+            if confirm_timeframes:
+                for tf in confirm_timeframes:
+                    df[f"TREND_{tf}"] = timeframe.trend_up_asof(raw, tf, config.MA_PERIOD)
             data_map[ticker] = df
         except Exception:
             continue
+    return data_map
 
+def run_strict_backtest_with_combined_judge(
+    tickers,
+    start_date,
+    end_date,
+    initial_capital=1_000_000,
+    unit=100,
+    fee_rate=0.0,
+    slippage_rate=0.0,
+    treat_gamble_as_buy=False,
+    max_correlated=None,
+    corr_threshold=config.CORR_THRESHOLD,
+    corr_window=config.CORR_WINDOW,
+    confirm_timeframes=(),
+):
+    # max_correlated: 買い候補と高相関（corr_threshold以上）の保有銘柄がこの数以上なら買わない（Noneで無効）
+    # confirm_timeframes: 例 ("W", "M")。前日時点で各上位足の終値が25本MAを上回っていなければ買わない
+    data_map = load_backtest_data(tickers, start_date, end_date, confirm_timeframes=confirm_timeframes)
+    return simulate_backtest(
+        data_map,
+        start_date,
+        initial_capital=initial_capital,
+        unit=unit,
+        fee_rate=fee_rate,
+        slippage_rate=slippage_rate,
+        treat_gamble_as_buy=treat_gamble_as_buy,
+        max_correlated=max_correlated,
+        corr_threshold=corr_threshold,
+        corr_window=corr_window,
+        confirm_timeframes=confirm_timeframes,
+    )
+
+def simulate_backtest(
+    data_map,
+    start_date,
+    initial_capital=1_000_000,
+    unit=100,
+    fee_rate=0.0,
+    slippage_rate=0.0,
+    treat_gamble_as_buy=False,
+    max_correlated=None,
+    corr_threshold=config.CORR_THRESHOLD,
+    corr_window=config.CORR_WINDOW,
+    confirm_timeframes=(),
+):
+    # 資金を共有する売買シミュレーション（data_map の順に銘柄を処理する）
     if not data_map:
         return 0.0, initial_capital, pd.DataFrame()
 
@@ -154,12 +211,23 @@ def run_strict_backtest_with_combined_judge(
     portfolio = {t: {"shares": 0, "avg_price": 0.0} for t in data_map.keys()}
     trades = []
 
+    corr = None
+    if max_correlated is not None:
+        returns = pd.DataFrame({t: df["_LOGRET"] for t, df in data_map.items()}).reindex(all_dates)
+        corr = RollingCorrelation(list(data_map.keys()), window=corr_window)
+        fed = 0
+
     for exec_date in sim_dates:
         i = all_dates.index(exec_date)
         if i == 0:
             continue
         prev_date = all_dates[i - 1]
 
+        # 前日までのリターンで相関を差分更新（当日の情報は使わない）
+        if corr is not None:
+            corr.update_many(returns.iloc[fed:i])
+            fed = i
+
         for ticker, df in data_map.items():
             if prev_date not in df.index or exec_date not in df.index:
                 continue
@@ -177,6 +245,12 @@ def run_strict_backtest_with_combined_judge(
             sell_px = open_price * (1.0 - slippage_rate)
 
             if action == "BUY":
+                if not all(row_prev[f"TREND_{tf}"] for tf in confirm_timeframes):
+                    continue
+                if corr is not None:
+                    held = [t for t, pos in portfolio.items() if pos["shares"] > 0 and t != ticker]
+                    if len(corr.correlated_with(ticker, held, corr_threshold)) >= max_correlated:
+                        continue
                 cost = buy_px * unit
                 fee = cost * fee_rate
                 if cash >= cost + fee:
@@ -268,19 +342,50 @@ tickers = [
 "6594.T","7564.T","6240.T","7532.T","3116.T"
 ]
 
-profit, final_value, trades = run_strict_backtest_with_combined_judge(
-    tickers,
-    start_date="2025-10-01",
-    end_date="2025-11-01",
-    initial_capital=1_000_000,
-    unit=100,
-    fee_rate=0.0,
-    slippage_rate=0.0,
-    treat_gamble_as_buy=False,
-)
+if __name__ == "__main__":
+    import argparse
+
+    import shard
+    import universe
+
+    parser = argparse.ArgumentParser(description="σバンド判定のバックテスト")
+    parser.add_argument("--universe", action="store_true", help="japan_stocks.csv の全銘柄で実行する")
+    parser.add_argument("--shard-index", type=int, default=None, help="このプロセスが担当するシャード番号（0始まり）")
+    parser.add_argument("--shard-count", type=int, default=1, help="シャード数")
+    parser.add_argument("--merge", action="store_true", help="全シャードの途中結果をマージして集計する")
+    args = parser.parse_args()
+
+    if args.universe:
+        tickers = universe.load_tickers()
+    start_date = "2025-10-01"
+    end_date = "2025-11-01"
+    meta = {"start_date": start_date, "end_date": end_date}
+
+    if args.shard_index is not None:
+        part = shard.shard_slice(tickers, args.shard_index, args.shard_count)
+        data_map = load_backtest_data(part, start_date, end_date)
+        path = shard.write_shard("backtest", args.shard_index, args.shard_count, part, data_map, meta=meta)
+        print(f"シャード {args.shard_index}/{args.shard_count}: {len(data_map)}/{len(part)}銘柄 → {path}")
+    else:
+        if args.merge:
+            data_map = shard.merge_shards("backtest", args.shard_count, tickers, meta=meta)
+        else:
+            data_map = load_backtest_data(tickers, start_date, end_date)
+
+        profit, final_value, trades = simulate_backtest(
+            data_map,
+            start_date,
+            initial_capital=1_000_000,
+            unit=100,
+            fee_rate=0.0,
+            slippage_rate=0.0,
+            treat_gamble_as_buy=False,
+        )
+
+        print(f"最終総資産: {final_value:,.0f}円 / 総損益: {profit:,.0f}円")
+        if not trades.empty:
+            print(trades.tail(20).to_string(index=False))
+        else:
+            print("取引はありませんでした。条件が厳しすぎる可能性があります。")
 
-print(f"最終総資産: {final_value:,.0f}円 / 総損益: {profit:,.0f}円")
-if not trades.empty:
-    print(trades.tail(20).to_string(index=False))
-else:
-    print("取引はありませんでした。条件が厳しすぎる可能性があります。")
+    print(format_stats(get_cache().stats()))
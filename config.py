@@ -41,3 +41,25 @@ OUTPUT_HTML = "docs/index.html"
 
 # メール設定（環境変数から読み込む）
 # SMTP_SERVER, SMTP_PORT, EMAIL_FROM, EMAIL_PASSWORD, EMAIL_TO は.envで設定
+
+# 分析対象ユニバース（全銘柄リスト）
+UNIVERSE_FILE = "japan_stocks.csv"
+
+# 相関エンジンの設定
+CORR_WINDOW = 60        # ローリング相関の期間（営業日）
+CORR_THRESHOLD = 0.7    # この値以上を「高相関」とみなす
+
+# 上位足での確認（例: ["W", "M"]）。空なら日足のみで判定
+CONFIRM_TIMEFRAMES = []
+
+# 上位足で確認する場合の日足の取得期間（月足25MAには2年以上必要）
+MTF_DATA_PERIOD = "3y"
+
+# シャード実行の途中結果の保存先
+SHARD_DIR = ".cache/shards"
+
+# 指標計算キャッシュ
+INDICATOR_CACHE_ENABLED = True
+INDICATOR_CACHE_DIR = ".cache/indicators"
+INDICATOR_CACHE_MAX_ENTRIES = 256              # プロセス内に保持する件数
+INDICATOR_CACHE_MAX_BYTES = 500 * 1024 * 1024  # ディスクキャッシュの上限（500MB）
@@ -0,0 +1,182 @@
+"""
+ユニバース横断の相関・共分散エンジン
+
+全銘柄の日次対数リターンからローリング共分散/相関行列を計算する。
+窓内の集計量（積和・和・件数）を行列積のランク更新で差分更新するため、
+1日分の更新は全再計算ではなく O(N^2) で済む（行列積は numpy 経由で BLAS を使用）。
+欠損（未上場・売買なし）は pandas の DataFrame.corr() と同じくペアごとの共通観測で扱う。
+"""
+
+import numpy as np
+import pandas as pd
+
+import config
+
+
+class RollingCorrelation:
+    """
+    直近 window 日のリターンに対するローリング共分散/相関
+
+    保持する集計量（X: 欠損を0にしたリターン, M: 観測マスク）:
+        C  = M^T M        ペアごとの共通観測数
+        S  = X^T M        S[i, j] = 銘柄jが観測された日の銘柄iのリターン和
+        Q  = (X*X)^T M    同じく二乗和
+        P  = X^T X        積和
+    """
+
+    def __init__(self, tickers, window=None, min_periods=None, rebuild_every=None):
+        """
+        Args:
+            tickers: 銘柄コードのリスト（行列の並び順になる）
+            window: ローリング期間（営業日、省略時は config.CORR_WINDOW）
+            min_periods: 相関を出すのに必要な最小共通観測数（省略時は window の半分）
+            rebuild_every: 丸め誤差の蓄積を防ぐため、この回数の更新ごとに窓から再計算する
+        """
+        self.tickers = list(tickers)
+        self.window = int(window or config.CORR_WINDOW)
+        self.min_periods = int(min_periods or max(2, self.window // 2))
+        self.rebuild_every = int(rebuild_every or self.window)
+        self._index = {t: i for i, t in enumerate(self.tickers)}
+
+        n = len(self.tickers)
+        self._rows = np.empty((0, n))
+        self._dates = []
+        self._C = np.zeros((n, n))
+        self._S = np.zeros((n, n))
+        self._Q = np.zeros((n, n))
+        self._P = np.zeros((n, n))
+        self._updates_since_rebuild = 0
+        self._cov = None
+        self._corr = None
+
+    @property
+    def last_date(self):
+        """窓に含まれる最新日（未更新なら None）"""
+        return self._dates[-1] if self._dates else None
+
+    def _accumulate(self, rows, sign):
+        """rows（日数×銘柄）の寄与を集計量に加算（sign=-1 で減算）"""
+        if len(rows) == 0:
+            return
+        mask = ~np.isnan(rows)
+        x = np.where(mask, rows, 0.0)
+        m = mask.astype(float)
+        self._C += sign * (m.T @ m)
+        self._S += sign * (x.T @ m)
+        self._Q += sign * ((x * x).T @ m)
+        self._P += sign * (x.T @ x)
+
+    def _rebuild(self):
+        """窓内の全行から集計量を作り直す"""
+        for mat in (self._C, self._S, self._Q, self._P):
+            mat.fill(0.0)
+        self._accumulate(self._rows, 1.0)
+        self._updates_since_rebuild = 0
+
+    def update(self, date, returns):
+        """
+        1日分のリターンを追加
+
+        Args:
+            date: 日付
+            returns: 銘柄→リターンの Series/辞書、または tickers 順の配列
+        """
+        if isinstance(returns, (pd.Series, dict)):
+            returns = pd.Series(returns).reindex(self.tickers)
+        row = np.asarray(returns, dtype=float).reshape(1, -1)
+        self.update_many(pd.DataFrame(row, index=[pd.Timestamp(date)], columns=self.tickers))
+
+    def update_many(self, returns):
+        """
+        複数日分のリターンをまとめて追加（日付順、最新日以前の行は無視）
+
+        追加分と窓から押し出される分をそれぞれ1回の行列積で反映する。
+
+        Args:
+            returns: index=日付, columns=銘柄 の DataFrame
+        """
+        if returns is None or len(returns) == 0:
+            return
+        returns = returns.reindex(columns=self.tickers).sort_index()
+        if self.last_date is not None:
+            returns = returns[returns.index > self.last_date]
+        if len(returns) == 0:
+            return
+
+        new_rows = returns.to_numpy(dtype=float)
+        combined = np.vstack([self._rows, new_rows])
+        dates = self._dates + list(returns.index)
+        evicted = combined[:-self.window] if len(combined) > self.window else combined[:0]
+
+        self._rows = combined[-self.window:]
+        self._dates = dates[-self.window:]
+        self._updates_since_rebuild += len(new_rows)
+        if len(new_rows) >= self.window or self._updates_since_rebuild >= self.rebuild_every:
+            self._rebuild()
+        else:
+            self._accumulate(new_rows, 1.0)
+            self._accumulate(evicted, -1.0)
+
+        self._cov = None
+        self._corr = None
+
+    def _compute(self):
+        """集計量から共分散・相関行列を計算（次の更新までキャッシュ）"""
+        if self._cov is not None:
+            return
+        C, S, Q, P = self._C, self._S, self._Q, self._P
+        valid = C >= self.min_periods
+        with np.errstate(divide='ignore', invalid='ignore'):
+            denom = np.where(valid, C - 1.0, np.nan)
+            cov = (P - S * S.T / C) / denom
+            var = (Q - S * S / C) / denom
+            corr = cov / np.sqrt(var * var.T)
+        corr = np.clip(corr, -1.0, 1.0)
+        diag = np.diag(var) > 0
+        corr[np.diag_indices_from(corr)] = np.where(diag, 1.0, np.nan)
+        self._cov = cov
+        self._corr = corr
+
+    def covariance_matrix(self):
+        """共分散行列（numpy.ndarray、tickers 順）"""
+        self._compute()
+        return self._cov
+
+    def correlation_matrix(self):
+        """相関行列（numpy.ndarray、tickers 順）"""
+        self._compute()
+        return self._corr
+
+    def covariance(self):
+        """共分散行列（pandas.DataFrame）"""
+        return pd.DataFrame(self.covariance_matrix(), index=self.tickers, columns=self.tickers)
+
+    def correlation(self):
+        """相関行列（pandas.DataFrame）"""
+        return pd.DataFrame(self.correlation_matrix(), index=self.tickers, columns=self.tickers)
+
+    def correlated_with(self, ticker, others, threshold=None):
+        """
+        others のうち ticker との相関が threshold 以上の銘柄を返す
+
+        Args:
+            ticker: 基準の銘柄コード
+            others: 比較対象の銘柄コードのリスト
+            threshold: 相関の閾値（省略時は config.CORR_THRESHOLD）
+
+        Returns:
+            list: 高相関の銘柄コード
+        """
+        threshold = config.CORR_THRESHOLD if threshold is None else threshold
+        i = self._index.get(ticker)
+        if i is None:
+            return []
+        corr = self.correlation_matrix()
+        result = []
+        for other in others:
+            j = self._index.get(other)
+            if j is None or j == i:
+                continue
+            if corr[i, j] >= threshold:
+                result.append(other)
+        return result
@@ -0,0 +1,226 @@
+"""
+指標計算のメモ化キャッシュ
+
+入力の価格データ（インデックス・列名・値）と指標パラメータのハッシュをキーに、
+計算結果をプロセス内のLRUとディスクの2段でキャッシュする。
+ディスク側は合計サイズをプロセス内で追跡し、容量上限を超えたときだけディレクトリを
+走査して古い（最後に使われたのが古い）ものから削除する。
+書き込みは一時ファイル経由の置き換えなので、複数プロセス（シャード）で共有できる。
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+import config
+
+# この回数書き込むごとにディレクトリを走査し直し、他プロセスの書き込み分を合計に反映する
+RESCAN_EVERY = 1000
+
+# 上限を超えたら、この割合まで減らす（超えるたびに走査しないよう余裕を持たせる）
+EVICT_TARGET_RATIO = 0.9
+
+
+def cache_key(name, data, params):
+    """
+    キャッシュキーを作る
+
+    Args:
+        name: 指標の名前（関数名など）
+        data: 入力の DataFrame / Series
+        params: 結果に影響するパラメータ（JSON にできる値）
+
+    Returns:
+        str: SHA-256 の16進文字列
+    """
+    h = hashlib.sha256()
+    h.update(name.encode('utf-8'))
+    h.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    columns = list(data.columns) if isinstance(data, pd.DataFrame) else [data.name]
+    h.update(repr(columns).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class IndicatorCache:
+    """プロセス内LRU + ディスクの2段キャッシュ"""
+
+    def __init__(self, directory=None, max_entries=None, max_bytes=None, enabled=None):
+        """
+        Args:
+            directory: ディスクキャッシュの保存先（省略時は config.INDICATOR_CACHE_DIR）
+            max_entries: プロセス内に保持する件数の上限
+            max_bytes: ディスクキャッシュの合計サイズの上限（バイト）
+            enabled: False ならキャッシュせず毎回計算する
+        """
+        self.directory = Path(directory or config.INDICATOR_CACHE_DIR)
+        self.max_entries = int(max_entries or config.INDICATOR_CACHE_MAX_ENTRIES)
+        self.max_bytes = int(max_bytes or config.INDICATOR_CACHE_MAX_BYTES)
+        self.enabled = config.INDICATOR_CACHE_ENABLED if enabled is None else enabled
+        self._memory = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._disk_bytes = None  # ディスクの合計サイズ（最初の書き込み時に走査して以降は加算で追跡）
+        self._writes_since_scan = 0
+
+    def get_or_compute(self, name, data, params, compute):
+        """
+        キャッシュにあれば返し、なければ compute(data) を計算して保存する
+
+        戻り値はコピーなので、呼び出し側で列を追加してもキャッシュは変わらない。
+
+        Args:
+            name: 指標の名前
+            data: 入力の DataFrame / Series
+            params: 結果に影響するパラメータ
+            compute: data を受け取って結果を返す関数
+
+        Returns:
+            計算結果（DataFrame / Series）
+        """
+        if not self.enabled:
+            return compute(data)
+
+        key = cache_key(name, data, params)
+
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            return self._memory[key].copy()
+
+        result = self._read(key)
+        if result is not None:
+            self._stats["disk_hits"] += 1
+        else:
+            self._stats["misses"] += 1
+            result = compute(data)
+            self._write(key, result)
+
+        self._remember(key, result)
+        return result.copy()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.pkl"
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read(self, key):
+        """ディスクから読む（他プロセスに削除された・壊れている場合は None）"""
+        path = self._path(key)
+        try:
+            result = pd.read_pickle(path)
+            os.utime(path)  # 最終利用時刻を更新（LRU の順序に使う）
+            return result
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: broken indicator cache entry {path}: {e}")
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+
+    def _write(self, key, result):
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            pd.to_pickle(result, tmp)
+            size = tmp.stat().st_size
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Warning: failed to write indicator cache {path}: {e}")
+            return
+
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _, size, _ in self._entries())
+        else:
+            self._disk_bytes += size
+        self._writes_since_scan += 1
+        if self._disk_bytes > self.max_bytes or self._writes_since_scan >= RESCAN_EVERY:
+            self._evict()
+
+    def _entries(self):
+        """ディスク上のエントリを (最終利用時刻, サイズ, パス) のリストで返す"""
+        entries = []
+        for path in self.directory.glob("*/*.pkl"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        """ディレクトリを走査して合計サイズを取り直し、上限を超えていれば古いものから削除"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TARGET_RATIO
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                    self._stats["evictions"] += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+        self._disk_bytes = total
+        self._writes_since_scan = 0
+
+    def stats(self):
+        """
+        ヒット/ミスの統計
+
+        disk_bytes はこのプロセスで追跡している合計サイズ（書き込みがなければ None）。
+        ディレクトリは走査しない。
+        """
+        stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self._memory)
+        stats["disk_bytes"] = self._disk_bytes
+        return stats
+
+    def clear(self):
+        """プロセス内とディスクのキャッシュをすべて削除"""
+        self._memory.clear()
+        self._disk_bytes = 0
+        self._writes_since_scan = 0
+        for _, _, path in self._entries():
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+_default_cache = None
+
+
+def get_cache():
+    """プロセス共通の IndicatorCache"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IndicatorCache()
+    return _default_cache
+
+
+def format_stats(stats):
+    """統計を1行の文字列にする"""
+    text = (
+        f"Indicator cache: hit {stats['memory_hits'] + stats['disk_hits']}"
+        f" (memory {stats['memory_hits']}, disk {stats['disk_hits']})"
+        f" / miss {stats['misses']} ({stats['hit_rate'] * 100:.0f}%)"
+    )
+    if stats["disk_bytes"] is not None:
+        text += f", disk {stats['disk_bytes'] / 1024 / 1024:.1f}MB"
+    return text
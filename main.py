@@ -6,6 +6,7 @@
 
 import os
 import json
+import argparse
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -17,14 +18,23 @@ from jinja2 import Template
 import subprocess
 
 import config
+import shard
+import universe
+from timeframe import trend_up_asof
 
 
 # 環境変数を読み込む
 load_dotenv()
 
 
-def load_portfolio():
-    """ポートフォリオ状態を読み込む"""
+def load_portfolio(save_default=True):
+    """
+    ポートフォリオ状態を読み込む
+
+    Args:
+        save_default: ファイルがない場合に初期状態を書き出すか
+            （シャード実行では False にして、保存はマージ時だけ行う）
+    """
     if not Path(config.PORTFOLIO_FILE).exists():
         # デフォルトの状態を作成
         portfolio = {
@@ -38,7 +48,8 @@ def load_portfolio():
                 "entry_price": 0,
                 "date_bought": None
             }
-        save_portfolio(portfolio)
+        if save_default:
+            save_portfolio(portfolio)
         return portfolio
 
     with open(config.PORTFOLIO_FILE, 'r', encoding='utf-8') as f:
@@ -122,6 +133,27 @@ def check_buy_signal(df, ma):
     return condition1 and condition2 and condition3
 
 
+def check_timeframe_confirmation(df, timeframes):
+    """
+    上位足でも上昇トレンドかをチェック（判定ルールは timeframe.trend_up_asof）
+
+    各タイムフレームで以下を満たすこと (AND):
+    1. 最新の足の終値 > その足の25本移動平均線
+    2. 移動平均線の傾きが上向き
+
+    Args:
+        df: 株価データ（日足）のDataFrame
+        timeframes: 確認するタイムフレームのリスト (例: ["W", "M"])
+
+    Returns:
+        tuple: (bool, str) 確認できたか、できなかったタイムフレーム
+    """
+    for tf in timeframes:
+        if not trend_up_asof(df, tf, config.MA_PERIOD).iloc[-1]:
+            return False, tf
+    return True, ""
+
+
 def check_sell_signal(df, ma, portfolio, symbol):
     """
     売りシグナルをチェック
@@ -273,85 +305,133 @@ def git_push():
         print("Git is not installed or not in PATH")
 
 
-def main():
-    """メイン処理"""
-    print("=" * 60)
-    print("25MA Trend Follow Bot - Starting Analysis")
-    print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 60)
+def analyze_stock(stock, portfolio):
+    """
+    1銘柄を分析
+
+    Args:
+        stock: 銘柄情報 ({"symbol", "name", "rank"})
+        portfolio: ポートフォリオデータ
+
+    Returns:
+        tuple: (分析結果, シグナル or None)。データ不足の場合は None
+    """
+    symbol = stock["symbol"]
+    name = stock["name"]
+
+    print(f"\nAnalyzing {name} ({symbol})...")
+
+    # データ取得（上位足も同じ日足から作るので取得は1回）
+    period = config.MTF_DATA_PERIOD if config.CONFIRM_TIMEFRAMES else '60d'
+    df = fetch_stock_data(symbol, period=period)
+    if df is None or len(df) < config.MA_PERIOD:
+        print(f"  Insufficient data for {symbol}")
+        return None
 
-    # ポートフォリオを読み込む
-    portfolio = load_portfolio()
-
-    # 各銘柄を分析
-    stock_results = []
-    signals = []
-
-    for stock in config.STOCKS:
-        symbol = stock["symbol"]
-        name = stock["name"]
-
-        print(f"\nAnalyzing {name} ({symbol})...")
-
-        # データ取得
-        df = fetch_stock_data(symbol)
-        if df is None or len(df) < config.MA_PERIOD:
-            print(f"  Insufficient data for {symbol}")
-            continue
-
-        # 移動平均線を計算
-        ma = calculate_ma(df, config.MA_PERIOD)
-
-        # 現在の状態を取得
-        current_price = df['Close'].iloc[-1]
-        current_ma = ma.iloc[-1]
-        trend = get_trend_direction(ma)
-
-        # シグナル判定
-        buy_signal = check_buy_signal(df, ma)
-        sell_signal, sell_reason = check_sell_signal(df, ma, portfolio, symbol)
-
-        # 判定結果
-        if buy_signal:
-            judgment = "BUY 🔴"
-            signal_type = "買い"
-            signals.append({
-                "stock": stock,
-                "type": "買い",
-                "price": current_price,
-                "ma": current_ma,
-                "reason": "ゴールデンクロス達成 & 傾き上向き"
-            })
-        elif sell_signal:
-            judgment = "SELL 🔵"
-            signal_type = "売り"
-            signals.append({
-                "stock": stock,
-                "type": "売り",
-                "price": current_price,
-                "ma": current_ma,
-                "reason": sell_reason
-            })
-        else:
-            judgment = "WAIT"
-            signal_type = "待機"
-
-        # 結果を保存
-        stock_results.append({
-            "symbol": symbol,
-            "name": name,
-            "rank": stock["rank"],
-            "current_price": current_price,
+    # 移動平均線を計算
+    ma = calculate_ma(df, config.MA_PERIOD)
+
+    # 現在の状態を取得
+    current_price = df['Close'].iloc[-1]
+    current_ma = ma.iloc[-1]
+    trend = get_trend_direction(ma)
+
+    # シグナル判定
+    buy_signal = check_buy_signal(df, ma)
+    sell_signal, sell_reason = check_sell_signal(df, ma, portfolio, symbol)
+
+    if buy_signal and config.CONFIRM_TIMEFRAMES:
+        confirmed, failed_tf = check_timeframe_confirmation(df, config.CONFIRM_TIMEFRAMES)
+        if not confirmed:
+            print(f"  Buy signal not confirmed on timeframe {failed_tf}")
+            buy_signal = False
+
+    # 判定結果
+    if buy_signal:
+        judgment = "BUY 🔴"
+        signal_type = "買い"
+        signal = {
+            "stock": stock,
+            "type": "買い",
+            "price": current_price,
+            "ma": current_ma,
+            "reason": "ゴールデンクロス達成 & 傾き上向き"
+        }
+    elif sell_signal:
+        judgment = "SELL 🔵"
+        signal_type = "売り"
+        signal = {
+            "stock": stock,
+            "type": "売り",
+            "price": current_price,
             "ma": current_ma,
-            "trend": trend,
-            "judgment": judgment,
-            "signal_type": signal_type
-        })
+            "reason": sell_reason
+        }
+    else:
+        judgment = "WAIT"
+        signal_type = "待機"
+        signal = None
+
+    # 結果を保存
+    result = {
+        "symbol": symbol,
+        "name": name,
+        "rank": stock["rank"],
+        "current_price": current_price,
+        "ma": current_ma,
+        "trend": trend,
+        "judgment": judgment,
+        "signal_type": signal_type
+    }
+
+    print(f"  Price: {current_price:.2f}")
+    print(f"  25MA: {current_ma:.2f}")
+    print(f"  Trend: {trend}")
+    print(f"  Signal: {judgment}")
+
+    return result, signal
+
+
+def analyze_stocks(stocks, portfolio):
+    """
+    複数銘柄を分析
 
-        print(f"  Price: {current_price:.2f}")
-        print(f"  25MA: {current_ma:.2f}")
-        print(f"  Trend: {trend}")
-        print(f"  Signal: {judgment}")
+    Returns:
+        dict: 銘柄コード → (分析結果, シグナル or None)。データ不足の銘柄は含まない
+    """
+    analyses = {}
+    for stock in stocks:
+        analysis = analyze_stock(stock, portfolio)
+        if analysis is not None:
+            analyses[stock["symbol"]] = analysis
+    return analyses
+
+
+def load_stocks(use_universe=False):
+    """
+    分析対象の銘柄リストを返す
+
+    Args:
+        use_universe: True なら japan_stocks.csv の全銘柄、False なら config.STOCKS
+    """
+    if not use_universe:
+        return config.STOCKS
+    return [
+        {"symbol": row["ticker"], "name": row["company_name"], "rank": "-"}
+        for row in universe.load_universe()
+    ]
+
+
+def publish_results(analyses, portfolio):
+    """
+    分析結果からメール送信・HTML生成・Gitプッシュ・ポートフォリオ保存を行う
+
+    Args:
+        analyses: analyze_stocks の戻り値（この順に表示する）
+        portfolio: ポートフォリオデータ
+    """
+    stock_results = [result for result, _ in analyses.values()]
+    signals = [signal for _, signal in analyses.values() if signal is not None]
 
     # シグナルがあればメール送信
     if signals:
@@ -388,6 +468,46 @@ def main():
     # ポートフォリオを保存
     save_portfolio(portfolio)
 
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="25MA Trend Follow Bot")
+    parser.add_argument("--universe", action="store_true", help="japan_stocks.csv の全銘柄を分析する")
+    parser.add_argument("--shard-index", type=int, default=None, help="このプロセスが担当するシャード番号（0始まり）")
+    parser.add_argument("--shard-count", type=int, default=1, help="シャード数")
+    parser.add_argument("--merge", action="store_true", help="全シャードの途中結果をマージして公開する")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("25MA Trend Follow Bot - Starting Analysis")
+    print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60)
+
+    # ポートフォリオを読み込む（シャード実行では読み取りのみ）
+    portfolio = load_portfolio(save_default=args.shard_index is None)
+
+    stocks = load_stocks(args.universe)
+    symbols = [stock["symbol"] for stock in stocks]
+    meta = {"date": datetime.now().strftime("%Y-%m-%d")}
+
+    if args.shard_index is not None:
+        # 担当分だけ分析して途中結果を書き出す（公開はマージ時に行う）
+        part = shard.shard_slice(stocks, args.shard_index, args.shard_count)
+        analyses = analyze_stocks(part, portfolio)
+        path = shard.write_shard(
+            "analysis", args.shard_index, args.shard_count,
+            [stock["symbol"] for stock in part], analyses, meta=meta
+        )
+        print(f"\nShard {args.shard_index}/{args.shard_count} written: {path}")
+        return
+
+    if args.merge:
+        analyses = shard.merge_shards("analysis", args.shard_count, symbols, meta=meta)
+    else:
+        analyses = analyze_stocks(stocks, portfolio)
+
+    publish_results(analyses, portfolio)
+
     print("\n" + "=" * 60)
     print("Analysis completed successfully")
     print("=" * 60)
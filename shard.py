@@ -0,0 +1,102 @@
+"""
+ユニバースの分割実行（シャード）と結果のマージ
+
+銘柄リストを shard_index::shard_count で決定的に分割し、各シャードの途中結果を
+ファイルに書き出す。マージ時は元の銘柄リストの順に並べ直すので、
+結果は1台で全銘柄を処理した場合と同じになる。
+"""
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+import config
+
+
+def shard_slice(items, shard_index, shard_count):
+    """
+    リストからシャード分を取り出す（ストライド分割で業種の偏りを避ける）
+
+    Args:
+        items: 銘柄などのリスト（順序が分割の基準になる）
+        shard_index: 0 始まりのシャード番号
+        shard_count: シャード数
+
+    Returns:
+        list: items[shard_index::shard_count]
+    """
+    if shard_count < 1:
+        raise ValueError(f"shard_count は1以上にしてください: {shard_count}")
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index は 0〜{shard_count - 1} にしてください: {shard_index}")
+    return list(items)[shard_index::shard_count]
+
+
+def shard_path(kind, shard_index, shard_count, directory=None):
+    """シャードの途中結果ファイルのパス"""
+    directory = Path(directory or config.SHARD_DIR)
+    return directory / f"{kind}_{shard_index:03d}_of_{shard_count:03d}.pkl"
+
+
+def write_shard(kind, shard_index, shard_count, keys, payload, meta=None, directory=None):
+    """
+    シャードの途中結果を書き出す（一時ファイル経由で置き換えるので途中状態は残らない）
+
+    Args:
+        kind: 結果の種類（"analysis", "backtest" など）
+        shard_index: シャード番号
+        shard_count: シャード数
+        keys: このシャードが担当した銘柄のリスト
+        payload: 銘柄→結果 の辞書
+        meta: 実行条件（期間など）。マージ時に全シャードで一致するか確認する
+
+    Returns:
+        Path: 書き出したファイル
+    """
+    path = shard_path(kind, shard_index, shard_count, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    pd.to_pickle({
+        "kind": kind,
+        "shard_index": shard_index,
+        "shard_count": shard_count,
+        "keys": list(keys),
+        "meta": meta,
+        "payload": payload,
+    }, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def merge_shards(kind, shard_count, order, meta=None, directory=None):
+    """
+    全シャードの途中結果を読み込み、order の順に並べた辞書にする
+
+    Args:
+        kind: 結果の種類
+        shard_count: シャード数
+        order: 元の（分割前の）銘柄リスト
+        meta: write_shard に渡した実行条件
+        directory: 途中結果の保存先
+
+    Returns:
+        dict: 銘柄→結果（order の順、結果のない銘柄は含まない）
+
+    Raises:
+        FileNotFoundError: シャードのファイルが揃っていない
+        ValueError: シャードの担当銘柄や実行条件が一致しない
+    """
+    merged = {}
+    for shard_index in range(shard_count):
+        path = shard_path(kind, shard_index, shard_count, directory)
+        if not path.exists():
+            raise FileNotFoundError(f"シャードの結果がありません: {path}")
+        shard = pd.read_pickle(path)
+        expected = shard_slice(order, shard_index, shard_count)
+        if shard["keys"] != expected:
+            raise ValueError(f"シャード {shard_index} の銘柄リストが一致しません: {path}")
+        if shard["meta"] != meta:
+            raise ValueError(f"シャード {shard_index} の実行条件が一致しません: {shard['meta']} != {meta}")
+        merged.update(shard["payload"])
+    return {key: merged[key] for key in order if key in merged}
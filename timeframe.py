@@ -0,0 +1,202 @@
+"""
+日足から週足・月足を作るマルチタイムフレーム層
+
+追加のダウンロードはせず、取得済みの日足1本から週足/月足のOHLCVを作る。
+最新の（未確定の）足は、その期間に属する日足だけを集計し直して差分更新する。
+"""
+
+import pandas as pd
+
+import check
+
+# タイムフレーム → pandas の期間コード（None は日足そのもの）
+TIMEFRAMES = {"D": None, "W": "W-FRI", "M": "M"}
+
+# 日足 → 上位足の集計方法
+OHLCV_AGG = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Adj Close": "last",
+    "Volume": "sum",
+}
+
+# 25本MAを計算するのに必要な日足の暦日数（1本あたりの暦日数の目安）
+CALENDAR_DAYS_PER_BAR = {"D": 1.5, "W": 7, "M": 31}
+
+
+def lookback_days(timeframe, period=25):
+    """period 本の足を作るのに必要な日足の暦日数の目安"""
+    return int(CALENDAR_DAYS_PER_BAR[timeframe] * (period + 1))
+
+
+def _flatten(df):
+    """yf.download の MultiIndex 列を1段にし、OHLCV列だけを残す"""
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    return df[[c for c in OHLCV_AGG if c in df.columns]]
+
+
+def _period_keys(index, timeframe):
+    """日付インデックスを所属する期間（週/月）に変換"""
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    return index.to_period(TIMEFRAMES[timeframe])
+
+
+def resample_ohlcv(daily, timeframe):
+    """
+    日足を上位足に集計（全期間）
+
+    各足のラベルはその期間の最終取引日（未確定の足は最新の日付）にする。
+
+    Args:
+        daily: 日足の DataFrame（Open/High/Low/Close/Adj Close/Volume）
+        timeframe: "D", "W", "M" のいずれか
+
+    Returns:
+        pandas.DataFrame: 集計した足
+    """
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"未対応のタイムフレームです: {timeframe}")
+    daily = _flatten(daily)
+    if TIMEFRAMES[timeframe] is None or daily.empty:
+        return daily.copy()
+
+    keys = _period_keys(daily.index, timeframe)
+    agg = {c: OHLCV_AGG[c] for c in daily.columns}
+    bars = daily.groupby(keys, sort=True).agg(agg)
+    bars.index = pd.Series(daily.index, index=keys).groupby(level=0).last().to_numpy()
+    bars.index.name = daily.index.name
+    return bars
+
+
+def trend_up_asof(daily, timeframe, period=25):
+    """
+    各日付時点で、その足が上昇トレンドか（main.py と バックテストで共通の確認ルール）
+
+    条件 (AND):
+    1. 足の終値 > その足の period 本移動平均線
+    2. 移動平均線の傾きが上向き（今の足のMA > 1本前の足のMA）
+
+    上位足では当日の日足終値を未確定の足の終値とみなすので、先の日付の情報は使わない
+    （最新日の値は、その日までの日足から足を作って判定した結果と同じになる）。
+
+    Args:
+        daily: 日足の DataFrame（Close 列を使う）
+        timeframe: "D", "W", "M" のいずれか
+        period: 移動平均の期間（足の本数）
+
+    Returns:
+        pandas.Series: 日足と同じインデックスの bool（判定不能は False）
+    """
+    daily = _flatten(daily)
+    price = daily["Close"].astype(float)
+    if TIMEFRAMES[timeframe] is None:
+        sma = price.rolling(period).mean()
+        return (price > sma) & (sma > sma.shift(1))
+
+    keys = _period_keys(daily.index, timeframe)
+    bar_close = price.groupby(keys).last()
+    # 直前までの確定足の終値の和と、1本前の足のMA
+    prev_sum = bar_close.rolling(period - 1).sum().shift(1).reindex(keys).to_numpy()
+    prev_sma = bar_close.rolling(period).mean().shift(1).reindex(keys).to_numpy()
+    sma = (prev_sum + price.to_numpy()) / period
+    return pd.Series((price.to_numpy() > sma) & (sma > prev_sma), index=daily.index)
+
+
+class BarResampler:
+    """1つのタイムフレームの足を日足から差分更新で保持する"""
+
+    def __init__(self, timeframe):
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"未対応のタイムフレームです: {timeframe}")
+        self.timeframe = timeframe
+        self.bars = None
+        self._tail = None  # 最新の足に属する日足
+
+    def update(self, daily):
+        """
+        日足を反映して足を更新
+
+        全期間の日足でも、新しい日付分だけでもよい。最新の足の期間より前の行は
+        確定済みとして無視し、最新の足はその期間の日足から集計し直す
+        （当日の日足が取引時間中に変わっても正しく反映される）。
+
+        Args:
+            daily: 日足の DataFrame
+
+        Returns:
+            pandas.DataFrame: 更新後の足
+        """
+        daily = _flatten(daily)
+        if daily.empty:
+            return self.bars
+        if self.bars is None or self.bars.empty:
+            return self._reset(daily)
+
+        new = daily[daily.index >= self._tail.index[0]]
+        if new.empty:
+            return self.bars
+        rows = pd.concat([self._tail[~self._tail.index.isin(new.index)], new]).sort_index()
+        tail_bars = resample_ohlcv(rows, self.timeframe)
+        self.bars = pd.concat([self.bars.iloc[:-1], tail_bars])
+        self._set_tail(rows)
+        return self.bars
+
+    def _reset(self, daily):
+        self.bars = resample_ohlcv(daily, self.timeframe)
+        self._set_tail(daily)
+        return self.bars
+
+    def _set_tail(self, daily):
+        if TIMEFRAMES[self.timeframe] is None:
+            self._tail = daily.iloc[-1:]
+            return
+        keys = _period_keys(daily.index, self.timeframe)
+        self._tail = daily[keys == keys[-1]]
+
+
+class MultiTimeframe:
+    """
+    1本の日足から複数タイムフレームの足と指標を提供する
+
+    指標は check.add_indicators_strict をそのまま各足に適用する
+    （25本MA・14本RSI・σバンドを、日足なら日数、週足なら週数として計算）。
+    """
+
+    def __init__(self, daily=None, timeframes=("D", "W", "M")):
+        self.timeframes = tuple(timeframes)
+        self._resamplers = {tf: BarResampler(tf) for tf in self.timeframes}
+        self._indicators = {}
+        if daily is not None:
+            self.update(daily)
+
+    def update(self, daily):
+        """日足を反映（各タイムフレームは未確定の足だけ更新される）"""
+        for resampler in self._resamplers.values():
+            resampler.update(daily)
+        self._indicators.clear()
+
+    def bars(self, timeframe):
+        """指定タイムフレームの足"""
+        return self._resamplers[timeframe].bars
+
+    def indicators(self, timeframe):
+        """指定タイムフレームの足に指標を付けた DataFrame（次の update までキャッシュ）"""
+        if timeframe not in self._indicators:
+            self._indicators[timeframe] = check.add_indicators_strict(self.bars(timeframe))
+        return self._indicators[timeframe]
+
+    def judges(self):
+        """各タイムフレームの最新の足の判定 {タイムフレーム: 判定文字列}"""
+        return {tf: check.judge_from_row(self.indicators(tf).iloc[-1]) for tf in self.timeframes}
+
+    def actions(self, treat_gamble_as_buy=False):
+        """各タイムフレームの最新の足の BUY/SELL/HOLD"""
+        return {
+            tf: check.action_from_judge(judge, treat_gamble_as_buy=treat_gamble_as_buy)
+            for tf, judge in self.judges().items()
+        }
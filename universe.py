@@ -0,0 +1,36 @@
+"""
+ユニバース（japan_stocks.csv の全銘柄）の読み込み
+"""
+
+import csv
+from pathlib import Path
+
+import config
+
+
+def load_universe(path=None):
+    """
+    ユニバースCSVを読み込む
+
+    Args:
+        path: CSVファイルのパス（省略時は config.UNIVERSE_FILE）
+
+    Returns:
+        list: {"ticker": ..., "company_name": ...} の辞書のリスト（ファイル記載順、重複除外）
+    """
+    path = Path(path or config.UNIVERSE_FILE)
+    rows = []
+    seen = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            ticker = row["ticker"].strip()
+            if not ticker or ticker in seen:
+                continue
+            seen.add(ticker)
+            rows.append({"ticker": ticker, "company_name": row.get("company_name", "").strip()})
+    return rows
+
+
+def load_tickers(path=None):
+    """ユニバースの銘柄コードのみをリストで返す"""
+    return [row["ticker"] for row in load_universe(path)]